@@ -4,10 +4,21 @@
 import os
 import sys
 import csv
-import re
+import io
 import argparse
 import string
-from datetime import datetime, timezone
+import mmap
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from itertools import repeat
+from typing import Iterator
+
+# Number of bytes of a .vc0 file processed at once
+READ_CHUNK_SIZE = 4 * 1024 * 1024
+
+# Buffer size of the CSV output files
+WRITE_BUFFER_SIZE = 1024 * 1024
 
 def load_message_map(mapping_csv_path: str) -> dict:
     """
@@ -36,35 +47,95 @@ def load_message_map(mapping_csv_path: str) -> dict:
                 msg_type = row[1].strip()
                 desc = row[2].strip()
 
+                # Intern the strings, as the same few types and descriptions
+                # end up in a large number of rows
                 if code:
-                    message_map[code] = (msg_type, desc)
+                    message_map[sys.intern(code)] = (sys.intern(msg_type), sys.intern(desc))
 
     except OSError as e:
         print(f"Error opening or reading the message map file '{mapping_csv_path}': {e}")
 
     return message_map
 
-def replace_and_clean_line(line: str) -> str:
+# Translation table for 'bytes.translate()': printable ASCII characters are kept as-is,
+# any other byte is replaced with '?'
+_CLEAN_TABLE = bytearray(b'?' * 256)
+for char in string.printable:
+    _CLEAN_TABLE[ord(char)] = ord(char)
+
+# Replace STX, SOH, etc. with newline
+for byte in b'\x17\x15\x13\x12\x05\x04\x03\x02\x01\x00':
+    _CLEAN_TABLE[byte] = ord('\n')
+
+# Replace the bell character with a space
+_CLEAN_TABLE[0x07] = ord(' ')
+
+_CLEAN_TABLE = bytes(_CLEAN_TABLE)
+
+# Remove other unwanted control characters
+_CLEAN_DELETE = b'\x0B\x1C\x0F\x06\x1E\x08\x10\x1D\x0E\x11\x14\x16\x18\x19\x1F\x7F\x1A\x1B\x0C'
+
+def replace_and_clean_line(line: bytes) -> str:
     """
-    Performs replacements on the input line to remove or transform non-printing characters,
-    returning a cleaned string. Specifically:
+    Decodes the raw bytes of one or more lines and performs replacements to remove or
+    transform non-printing characters, returning a cleaned string. Specifically:
       - Certain control characters (e.g., STX, SOH) are replaced with '\n'.
       - The bell character '\x07' is replaced with a space.
       - Other non-printing control characters are removed.
       - Any remaining unprintable characters are replaced with '?'.
+
+    The replacements are applied to the raw bytes in a single pass using '_CLEAN_TABLE'.
+    Input that is not pure ASCII is decoded first and reduced to ASCII beforehand.
     """
-    # Replace STX, SOH, etc. with newline
-    line = re.sub(r'[\x17\x15\x13\x12\x05\x04\x03\x02\x01\x00]', '\n', line)
+    if not line.isascii():
+        text = line.decode("utf-8", errors="replace")
+
+        # Strip Unicode whitespace from the line ends before cleaning,
+        # which would otherwise turn it into '?'
+        text = "\n".join(raw_line.strip() for raw_line in text.split("\n"))
+
+        # Remove undecodable bytes and replace any other non-ASCII character with '?'
+        line = text.replace("\ufffd", "").encode("ascii", errors="replace")
+
+    return line.translate(_CLEAN_TABLE, _CLEAN_DELETE).decode("ascii")
+
+# Formatted timestamps by epoch second, see 'format_hex_timestamp()'
+_TIMESTAMP_CACHE = {}
+_TIMESTAMP_CACHE_SIZE = 4096
+
+def format_hex_timestamp(raw_hex_timestamp: str) -> str:
+    """
+    Converts a hex epoch timestamp to a UTC date/time string ("%Y-%m-%d %H:%M:%S").
+    Returns the raw value if it cannot be converted.
+
+    Consecutive log entries mostly share their timestamp, so results are cached by
+    epoch second in '_TIMESTAMP_CACHE', which is cleared once it grows too large.
+    """
+    try:
+        epoch_int = int(raw_hex_timestamp, 16)
+    except ValueError:
+        return raw_hex_timestamp  # fallback if parsing fails
+
+    dt_str = _TIMESTAMP_CACHE.get(epoch_int)
+    if dt_str is None:
+        try:
+            t = time.gmtime(epoch_int)
+        except (OSError, OverflowError):
+            return raw_hex_timestamp
+
+        # Keep to the year range supported by datetime
+        if not 1 <= t.tm_year <= 9999:
+            return raw_hex_timestamp
+
+        if len(_TIMESTAMP_CACHE) >= _TIMESTAMP_CACHE_SIZE:
+            _TIMESTAMP_CACHE.clear()
 
-    # Replace the bell character with a space
-    line = re.sub(r'[\x07]', ' ', line)
+        dt_str = _TIMESTAMP_CACHE[epoch_int] = "%04d-%02d-%02d %02d:%02d:%02d" % t[:6]
 
-    # Remove other unwanted control characters
-    line = re.sub(r'[\x0B\x1C\x0F\x06\x1E\x08\x10\x1D\x0E\x11\x14\x16\x17\x18\x19\x1F\x7F\x1A\x1B\x0C\uFFFD]', '', line)
+    return dt_str
 
-    # Replace remaining unprintable chars with '?'
-    printable = set(string.printable)
-    return ''.join(char if char in printable else '?' for char in line)
+# Message type and description for codes missing from the message map
+_EMPTY_MESSAGE = ('', '')
 
 def process_subline(subline: str, message_map: dict) -> list:
     """
@@ -72,9 +143,9 @@ def process_subline(subline: str, message_map: dict) -> list:
       - Hex timestamp as columns[0]
       - Hex line ID as columns[1]
       - Potential message code from columns[3]
-    Looks up the message code in 'message_map' to fill in columns[4] (MsgType) and [5] (Description).
+    Looks up the message code in 'message_map' to fill in row[4] (MsgType) and [5] (Description).
 
-    Returns a list of columns if successful, or None if the sub-line is invalid.
+    Returns the row as a list of columns if successful, or None if the sub-line is invalid.
     """
     # Convert tabs to commas, then split
     subline = subline.replace("\t", ",")
@@ -86,15 +157,10 @@ def process_subline(subline: str, message_map: dict) -> list:
 
     # Check if the first column is valid and contains a "."
     # Example: <hexTimestamp>.<hexLineID>
-    if len(columns) < 1 or "." not in columns[0]:
+    raw_hex_timestamp, sep, hex_line_id = columns[0].partition(".")
+    if not sep:
         return None
 
-    first_col = columns[0].split(".", 1)
-    if len(first_col) < 2:
-        return None
-
-    raw_hex_timestamp, hex_line_id = first_col[0], first_col[1]
-
     # Ensure there's at least a columns[3] for the message code
     if len(columns) < 4:
         return None
@@ -102,69 +168,130 @@ def process_subline(subline: str, message_map: dict) -> list:
     code = columns[3].strip()
 
     # Convert from hex epoch timestamp
-    try:
-        epoch_int = int(raw_hex_timestamp, 16)
-        dt_obj = datetime.fromtimestamp(epoch_int, tz=timezone.utc)
-        dt_str = dt_obj.strftime("%Y-%m-%d %H:%M:%S")
-    except (ValueError, OSError):
-        dt_str = raw_hex_timestamp  # fallback if parsing fails
-
-    # Prepend the parsed timestamp and hex line ID
-    columns[0] = dt_str
-    columns.insert(1, hex_line_id)
+    dt_str = format_hex_timestamp(raw_hex_timestamp)
 
     # Map message code to message type and description if available
-    msg_type, msg_desc = '', ''
-    if code in message_map:
-        msg_type, msg_desc = message_map[code]
-
-    # Ensure columns[4] is 'Msg Description' and columns[5] is 'Msg Category'
-    while len(columns) < 6:
-        columns.append('')
-
-    columns[4] = msg_type
-    columns[5] = msg_desc
+    msg_type, msg_desc = message_map.get(code, _EMPTY_MESSAGE)
 
-    return columns
+    # Build the row in the header layout directly: the parsed timestamp and hex line ID
+    # replace columns[0], and 'Msg Description'/'Msg Category' take the place of
+    # columns[3] and [4]; any further columns follow unchanged
+    return [dt_str, hex_line_id, columns[1], columns[2], msg_type, msg_desc, *columns[5:]]
 
-def get_vc0_content(vc0_path: str, message_map: dict) -> list:
+def get_vc0_content(vc0_path: str, message_map: dict) -> Iterator[list]:
     """
     Reads and processes a .vc0 file starting from byte offset 8192.
-    Decodes lines, cleans them, and splits any inserted newlines to sub-lines.
+    The file is memory-mapped and processed in chunks of about 'READ_CHUNK_SIZE' bytes;
+    each chunk's complete lines are cleaned and decoded at once, then split into sub-lines.
     Each valid sub-line is converted to columns via 'process_subline()'.
 
-    Returns a list of processed rows suitable for CSV output.
+    Yields the processed rows suitable for CSV output one by one, so they can be
+    written out without holding the whole file in memory.
     """
-    rows = []
     try:
         with open(vc0_path, "rb") as f_in:
-            # Skip the first 8192 bytes
-            f_in.seek(8192)
-
-            for raw_line in f_in:
-                try:
-                    line = raw_line.decode("utf-8", errors="replace").strip()
-                except UnicodeDecodeError as e:
-                    print(f"Error decoding line from '{vc0_path}': {e}")
-                    continue
-
-                line = replace_and_clean_line(line)
-
-                # If a single line contained certain control chars replaced by '\n'
-                # we split it into separate sub-lines
-                sub_lines = line.split('\n')
-                for sub in sub_lines:
-                    sub = sub.strip()
-                    if len(sub) < 3:
-                        # Skip short or empty sub-lines
-                        continue
-
-                    row = process_subline(sub, message_map)
-                    if row:
-                        rows.append(row)
+            size = os.fstat(f_in.fileno()).st_size
+            if size <= 8192:
+                return
+
+            with mmap.mmap(f_in.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if hasattr(mmap, "MADV_SEQUENTIAL"):
+                    mm.madvise(mmap.MADV_SEQUENTIAL)
+
+                # Skip the first 8192 bytes
+                pos = 8192
+                while pos < size:
+                    # Only process complete lines, up to the last newline within the next chunk.
+                    # A line longer than a chunk is taken as a whole, as is a trailing line
+                    # without a newline at the end of the file.
+                    end = mm.rfind(b"\n", pos, pos + READ_CHUNK_SIZE) + 1
+                    if not end:
+                        end = mm.find(b"\n", pos) + 1 or size
+
+                    block = replace_and_clean_line(mm[pos:end])
+                    pos = end
+
+                    # Lines are separated by '\n', as are the sub-lines produced by
+                    # control chars replaced with '\n', so a single split covers both
+                    for sub in block.split('\n'):
+                        sub = sub.strip()
+                        if len(sub) < 3:
+                            # Skip short or empty sub-lines
+                            continue
+
+                        row = process_subline(sub, message_map)
+                        if row:
+                            yield row
     except OSError as e:
         print(f"Failed to open or read the file '{vc0_path}': {e}")
-    return rows
+
+def format_csv_rows(rows: Iterator[list]) -> Iterator[str]:
+    """
+    Formats rows as CSV lines, yielding one line per row.
+
+    Cleaned log data is plain ASCII and rarely needs quoting, so rows are simply
+    joined with ','. Only rows containing a quote, a line break or a ',' within a
+    column are formatted by 'csv.writer' to get the correct quoting.
+    """
+    quoted = io.StringIO()
+    csv_writer = csv.writer(quoted, delimiter=",", lineterminator="\n")
+
+    for row in rows:
+        line = ",".join(row)
+        if '"' in line or '\r' in line or '\n' in line or line.count(",") != len(row) - 1:
+            csv_writer.writerow(row)
+            yield quoted.getvalue()
+            quoted.seek(0)
+            quoted.truncate()
+        else:
+            yield line + "\n"
+
+def process_vc0_file(vc0_path: str, output_path: str, message_map: dict) -> None:
+    """
+    Converts a single .vc0 file to a CSV file at 'output_path'.
+    Runs in a worker process, so it only depends on its arguments.
+    """
+    # Process the .vc0 file and stream the resulting rows to a CSV
+    with open(output_path, "w", buffering=WRITE_BUFFER_SIZE, newline="", encoding="utf-8") as csv_out:
+        csv_writer = csv.writer(csv_out, delimiter=",", lineterminator="\n")
+
+        # Example header row
+        csv_writer.writerow([
+            'Timestamp',
+            'Line ID',
+            'Device Hostname',
+            'Msg Code',
+            'Msg Description',
+            'Msg Category',
+            'Log Source Type',
+            'Device Network',
+            'Source IP',
+            'Msg Data 10',
+            'Msg Data 11',
+            'Msg Data 12',
+            'Msg Data 13',
+            'Msg Data 14',
+            'Msg Data 15',
+            'Msg Data 16',
+            'Msg Data 17',
+            'Msg Data 18',
+            'Msg Data 19',
+            'Msg Data 20',
+            'Msg Data 21',
+            'Msg Data 22',
+            'Msg Data 23',
+            'Msg Data 24',
+            'Msg Data 25',
+            'Msg Data 26',
+            'Msg Data 27',
+            'Msg Data 28',
+            'Msg Data 29',
+            'Msg Data 30'
+        ])
+
+        csv_out.writelines(format_csv_rows(get_vc0_content(vc0_path, message_map)))
+
+    print(f"Processed and wrote CSV: {output_path}")
 
 def main():
     print(
@@ -207,9 +334,12 @@ def main():
     if not os.path.isdir(output_dir):
         os.makedirs(output_dir)
 
-    # Identify all .vc0 files (ignoring lock files)
-    vc0_files = [f for f in os.listdir(input_dir)
-                 if f.endswith(".vc0") and not f.startswith("lck.")]
+    # Identify all .vc0 files (ignoring lock files). The directory entries
+    # come with the file size, so no separate stat call is needed per file.
+    with os.scandir(input_dir) as entries:
+        vc0_files = [(entry.name, entry.path, entry.stat().st_size) for entry in entries
+                     if entry.name.endswith(".vc0") and not entry.name.startswith("lck.")
+                     and entry.is_file()]
 
     if not vc0_files:
         print(f"No .vc0 files found in '{input_dir}'.")
@@ -217,11 +347,11 @@ def main():
 
     timestamp_str = datetime.now().strftime("%Y%m%d_%H%M%S")
 
-    for vc0_file in vc0_files:
-        vc0_path = os.path.join(input_dir, vc0_file)
-
+    vc0_paths = []
+    output_paths = []
+    for vc0_file, vc0_path, vc0_size in vc0_files:
         # Skip if the file is exactly 8192 bytes (often indicating an empty .vc0)
-        if os.path.getsize(vc0_path) == 8192:
+        if vc0_size == 8192:
             print(f"Skipping '{vc0_file}': file is empty (8192 bytes).")
             continue
 
@@ -229,51 +359,12 @@ def main():
         csv_filename = f"{timestamp_str}_{vc0_file}.csv"
         output_path = os.path.join(output_dir, csv_filename)
 
-        # Process the .vc0 file
-        rows = get_vc0_content(vc0_path, message_map)
-
-        # Write the resulting rows to a CSV
-        with open(output_path, "w", newline="", encoding="utf-8") as csv_out:
-            csv_writer = csv.writer(csv_out, delimiter=",", lineterminator="\n")
-
-            # Example header row
-            csv_writer.writerow([
-                'Timestamp',
-                'Line ID',
-                'Device Hostname',
-                'Msg Code',
-                'Msg Description',
-                'Msg Category',
-                'Log Source Type',
-                'Device Network',
-                'Source IP',
-                'Msg Data 10',
-                'Msg Data 11',
-                'Msg Data 12',
-                'Msg Data 13',
-                'Msg Data 14',
-                'Msg Data 15',
-                'Msg Data 16',
-                'Msg Data 17',
-                'Msg Data 18',
-                'Msg Data 19',
-                'Msg Data 20',
-                'Msg Data 21',
-                'Msg Data 22',
-                'Msg Data 23',
-                'Msg Data 24',
-                'Msg Data 25',
-                'Msg Data 26',
-                'Msg Data 27',
-                'Msg Data 28',
-                'Msg Data 29',
-                'Msg Data 30'
-            ])
-
-            for row in rows:
-                csv_writer.writerow(row)
-
-        print(f"Processed and wrote CSV: {output_path}")
+        vc0_paths.append(vc0_path)
+        output_paths.append(output_path)
+
+    # Each file is independent, so distribute them across worker processes
+    with ProcessPoolExecutor() as executor:
+        list(executor.map(process_vc0_file, vc0_paths, output_paths, repeat(message_map)))
 
 if __name__ == "__main__":
     main()